@@ -42,7 +42,6 @@ setup(
     python_requires=">=3.4",
     install_requires=[
         "mutagen",
-        "eyed3",
     ],
     entry_points={
         "console_scripts": [
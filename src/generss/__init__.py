@@ -11,15 +11,13 @@ genRSS -- generate an RSS 2.0 feed from media files in a directory.
 """
 
 import argparse
+import functools
+import operator
 import os
 import random
 import sys
 import time
-import urllib
 import urllib.parse
-from xml.sax import saxutils
-
-from generss.util import INDENT, file_to_item, get_files
 
 __all__ = []
 __version__ = "0.3.3"
@@ -27,128 +25,179 @@ __date__ = "2014-11-01"
 __updated__ = "2024-12-11"
 
 
-def main(argv=None):  # noqa: C901
-    program_name = os.path.basename(sys.argv[0])
+def _positive_int(value):
+    """argparse type for options that take a number greater than 0."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+@functools.lru_cache(maxsize=None)
+def _build_parser():
+    """Build the command line parser. It's built once and reused by main."""
     program_usage = "genRSS -d directory [OPTIONS]"
     program_longdesc = "Generates an RSS feed from files in a directory"
 
-    if argv is None:
-        argv = sys.argv[1:]
-    try:
-        parser = argparse.ArgumentParser(
-            usage=program_usage,
-            description=program_longdesc,
-            formatter_class=argparse.RawTextHelpFormatter,
-        )
-        parser.add_argument("--version", "-v", action="version", version=__version__)
-        parser.add_argument(
-            "-d",
-            "--dirname",
-            dest="dirname",
-            help="Directory to look for media files in.\n"
-            "This directory name will be appended to the host name\n"
-            "to create absolute paths to your media files.",
-            metavar="DIRECTORY",
-        )
-        parser.add_argument(
-            "-r",
-            "--recursive",
-            dest="recursive",
-            help="Look for media files recursively in subdirectories\n"
-            "[default: False]",
-            action="store_true",
-            default=False,
-        )
-        parser.add_argument(
-            "-L",
-            "--follow-symlinks",
-            dest="followlinks",
-            help="Follow symbolic links when doing a recursive scan\n"
-            "[default: False]",
-            action="store_true",
-            default=False,
-        )
-
-        parser.add_argument(
-            "-e",
-            "--extensions",
-            dest="extensions",
-            help=(
-                "A comma separated list of extensions (e.g. mp3,mp4,avi,ogg)"
-                "\n[default: all files]"
-            ),
-            type=str,
-            default=None,
-            metavar="STRING",
-        )
+    parser = argparse.ArgumentParser(
+        usage=program_usage,
+        description=program_longdesc,
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("--version", "-v", action="version", version=__version__)
+    parser.add_argument(
+        "-d",
+        "--dirname",
+        dest="dirname",
+        help="Directory to look for media files in.\n"
+        "This directory name will be appended to the host name\n"
+        "to create absolute paths to your media files.",
+        metavar="DIRECTORY",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        dest="recursive",
+        help="Look for media files recursively in subdirectories\n" "[default: False]",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "-L",
+        "--follow-symlinks",
+        dest="followlinks",
+        help="Follow symbolic links when doing a recursive scan\n" "[default: False]",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "-e",
+        "--extensions",
+        dest="extensions",
+        help=(
+            "A comma separated list of extensions (e.g. mp3,mp4,avi,ogg)"
+            "\n[default: all files]"
+        ),
+        type=str,
+        default=None,
+        metavar="STRING",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--out",
+        dest="outfile",
+        help="Output RSS file [default: stdout]",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "-H",
+        "--host",
+        dest="host",
+        help="Host name (or IP address), possibly with a protocol\n"
+        "(default: http) a port number and the path to the base\n"
+        "directory where your media directory is located.\n"
+        "Examples of host names:\n"
+        " - http://localhost:8080 [default]\n"
+        " - mywebsite.com/media/JapaneseLessons\n"
+        " - mywebsite\n"
+        " - 192.168.1.12:8080\n"
+        " - http://192.168.1.12/media/JapaneseLessons\n",
+        default="http://localhost:8080",
+        metavar="URL",
+    )
+    parser.add_argument(
+        "-i",
+        "--image",
+        dest="image",
+        help="Absolute or relative URL for feed's image [default: None]",
+        default=None,
+        metavar="URL",
+    )
+
+    parser.add_argument(
+        "-M",
+        "--metadata",
+        dest="use_metadata",
+        help="Use media files' metadata to extract item title [default: False]",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "-t",
+        "--title",
+        dest="title",
+        help="Title of the podcast [default: use directory name as title]",
+        default=None,
+        metavar="STRING",
+    )
+    parser.add_argument(
+        "-p",
+        "--description",
+        dest="description",
+        help="Description of the podcast [default: None]",
+        default=None,
+        metavar="STRING",
+    )
+    parser.add_argument(
+        "-C",
+        "--sort-creation",
+        dest="sort_creation",
+        help="Sort files by date of creation instead of file name (default)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        help="Number of threads used to read media files\n"
+        "[default: chosen by Python based on the number of CPUs]",
+        type=_positive_int,
+        default=None,
+        metavar="N",
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        help="Keep media files' duration and metadata in FILE and reuse\n"
+        "them for files that didn't change since the last run\n"
+        "[default: None]",
+        default=None,
+        metavar="FILE",
+    )
+    return parser
 
-        parser.add_argument(
-            "-o",
-            "--out",
-            dest="outfile",
-            help="Output RSS file [default: stdout]",
-            metavar="FILE",
-        )
-        parser.add_argument(
-            "-H",
-            "--host",
-            dest="host",
-            help="Host name (or IP address), possibly with a protocol\n"
-            "(default: http) a port number and the path to the base\n"
-            "directory where your media directory is located.\n"
-            "Examples of host names:\n"
-            " - http://localhost:8080 [default]\n"
-            " - mywebsite.com/media/JapaneseLessons\n"
-            " - mywebsite\n"
-            " - 192.168.1.12:8080\n"
-            " - http://192.168.1.12/media/JapaneseLessons\n",
-            default="http://localhost:8080",
-            metavar="URL",
-        )
-        parser.add_argument(
-            "-i",
-            "--image",
-            dest="image",
-            help="Absolute or relative URL for feed's image [default: None]",
-            default=None,
-            metavar="URL",
-        )
 
-        parser.add_argument(
-            "-M",
-            "--metadata",
-            dest="use_metadata",
-            help="Use media files' metadata to extract item title [default: False]",
-            action="store_true",
-            default=False,
-        )
+def main(argv=None):  # noqa: C901
+    program_name = os.path.basename(sys.argv[0])
 
-        parser.add_argument(
-            "-t",
-            "--title",
-            dest="title",
-            help="Title of the podcast [default: use directory name as title]",
-            default=None,
-            metavar="STRING",
-        )
-        parser.add_argument(
-            "-p",
-            "--description",
-            dest="description",
-            help="Description of the podcast [default: None]",
-            default=None,
-            metavar="STRING",
-        )
-        parser.add_argument(
-            "-C",
-            "--sort-creation",
-            dest="sort_creation",
-            help="Sort files by date of creation instead of file name (default)",
-            action="store_true",
-            default=False,
-        )
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
         # process options
-        opts = parser.parse_args(argv)
+        opts = _build_parser().parse_args(argv)
+
+        # imported once options are parsed so that --help and --version don't
+        # pay for loading media libraries
+        from xml.sax import saxutils
+
+        from generss.util import (
+            INDENT,
+            INDENT2,
+            INDENT3,
+            files_to_items,
+            format_rfc822_date,
+            load_cache,
+            save_cache,
+            scan_files,
+            stat_files,
+        )
 
         if opts.dirname is None or opts.host is None:
             raise Exception(
@@ -161,7 +210,7 @@ def main(argv=None):  # noqa: C901
                 )
             )
 
-        if not os.path.isdir(opts.dirname) or not os.path.exists(opts.dirname):
+        if not os.path.isdir(opts.dirname):
             raise Exception(
                 "\n".join(
                     [
@@ -171,56 +220,61 @@ def main(argv=None):  # noqa: C901
                 ).format(opts.dirname)
             )
 
-        dirname = opts.dirname
-        if dirname[-1] != os.sep:
-            dirname += os.sep
-        host = opts.host
-        if host[-1] != "/":
-            host += "/"
+        # normalize dirname and host so that both end with a separator
+        dirname = os.path.join(opts.dirname, "")
+        host = opts.host.rstrip("/") + "/"
 
-        if not host.lower().startswith("http://") and not host.lower().startswith(
-            "https://"
-        ):
+        if not host.lower().startswith(("http://", "https://")):
             host = "http://" + host
 
         title = ""
         description = ""
         link = host
         if opts.outfile is not None:
-            if link[-1] == "/":
-                link += opts.outfile
-            else:
-                link += "/" + opts.outfile
+            link += opts.outfile
+        # link is used both as element text and as attribute value
+        link = saxutils.escape(link, {'"': "&quot;"})
 
         if opts.title is None:
             title = os.path.split(dirname[:-1])[-1]
         else:
             title = opts.title
+        title = saxutils.escape(title)
 
         if opts.description is not None:
-            description = opts.description
+            description = saxutils.escape(opts.description)
 
         # get the list of the desired files
         if opts.extensions is not None:
             opts.extensions = [e for e in opts.extensions.split(",") if e != ""]
-        file_names = get_files(
+        # .txt files are collected during the scan to look up descriptions
+        txt_files = set()
+        entries = scan_files(
             dirname,
             extensions=opts.extensions,
             recursive=opts.recursive,
             followlinks=opts.followlinks,
+            max_workers=opts.jobs,
+            txt_files=txt_files,
         )
-        if len(file_names) == 0:
+        if len(entries) == 0:
             sys.stderr.write("No media files on directory '%s'\n" % (opts.dirname))
             sys.exit(0)
 
+        # stat files concurrently, results are cached by DirEntry objects and
+        # reused below to get file sizes and validate cache entries
+        stats = stat_files(entries, max_workers=opts.jobs)
+
         if opts.sort_creation:
             # sort files by date of creation if required
             # get files date of creation in seconds
-            pub_dates = [os.path.getmtime(f) for f in file_names]
+            pub_dates = [st.st_mtime for st in stats]
             # most feed readers will use pubDate to sort items even if they are
             # not sorted in the output file for readability, we also sort file_names
             # according to pubDates in the feed.
-            sorted_files = sorted(zip(file_names, pub_dates), key=lambda f: -f[1])
+            sorted_files = sorted(
+                zip(entries, pub_dates), key=operator.itemgetter(1), reverse=True
+            )
 
         else:
             # In order to have feed items sorted by name, we give them artificial
@@ -230,66 +284,74 @@ def main(argv=None):  # noqa: C901
             now = time.time()
             pub_dates = [
                 now - (60 * 60 * 24 * d + (random.random() * 10))
-                for d in range(len(file_names))
+                for d in range(len(entries))
             ]
-            sorted_files = zip(file_names, pub_dates)
-
-        # write dates in RFC 822 format
-        sorted_files = (
-            (
-                f[0],
-                time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(f[1])),
-            )
-            for f in sorted_files
+            sorted_files = zip(entries, pub_dates)
+
+        cache = None if opts.cache is None else load_cache(opts.cache)
+
+        # build items, with dates in RFC 822 format
+        items = files_to_items(
+            host,
+            [
+                (entry.path, format_rfc822_date(pub_date), entry.stat())
+                for entry, pub_date in sorted_files
+            ],
+            opts.use_metadata,
+            max_workers=opts.jobs,
+            cache=cache,
+            txt_files=txt_files,
         )
 
-        # build items
-        items = [
-            file_to_item(host, fname, pub_date, opts.use_metadata)
-            for fname, pub_date in sorted_files
+        # assemble the whole feed and write it at once
+        feed = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" xmlns:content="http://purl.org/rss/1.0/modules/content/">\n',  # noqa: B950
+            f"{INDENT}<channel>\n",
+            f'{INDENT2}<atom:link href="{link}" rel="self" type="application/rss+xml" />\n',
+            f"{INDENT2}<title>{title}</title>\n",
+            f"{INDENT2}<description>{description}</description>\n",
+            f"{INDENT2}<link>{link}</link>\n",
         ]
 
-        if opts.outfile is not None:
-            outfp = open(opts.outfile, "w")
-        else:
-            outfp = sys.stdout
-
-        outfp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        outfp.write(
-            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" xmlns:content="http://purl.org/rss/1.0/modules/content/">\n'  # noqa: B950
-        )
-        outfp.write(f"{INDENT}<channel>\n")
-        outfp.write(
-            f'{INDENT*2}<atom:link href="{link}" rel="self" type="application/rss+xml" />\n'
-        )
-        outfp.write(f"{INDENT*2}<title>{saxutils.escape(title)}</title>\n")
-        outfp.write(f"{INDENT*2}<description>{description}</description>\n")
-        outfp.write(f"{INDENT*2}<link>{link}</link>\n")
-
         if opts.image is not None:
-            if opts.image.lower().startswith(
-                "http://"
-            ) or opts.image.lower().startswith("https://"):
+            if opts.image.lower().startswith(("http://", "https://")):
                 imgurl = opts.image
             else:
                 imgurl = urllib.parse.quote(host + opts.image, ":/")
+            imgurl = saxutils.escape(imgurl, {'"': "&quot;"})
+
+            feed += [
+                f"{INDENT2}<image>\n",
+                f"{INDENT3}<url>{imgurl}</url>\n",
+                f"{INDENT3}<title>{title}</title>\n",
+                f"{INDENT3}<link>{link}</link>\n",
+                f"{INDENT2}</image>\n",
+                f'{INDENT2}<itunes:image href="{imgurl}"/>\n',
+            ]
 
-            outfp.write(f"{INDENT*2}<image>\n")
-            outfp.write(f"{INDENT*3}<url>{imgurl}</url>\n")
-            outfp.write(f"{INDENT*3}<title>{saxutils.escape(title)}</title>\n")
-            outfp.write(f"{INDENT*3}<link>{link}</link>\n")
-            outfp.write(f"{INDENT*2}</image>\n")
-            outfp.write(f'{INDENT*2}<itunes:image href="{imgurl}"/>\n')
-
-        for item in items:
-            outfp.write(item + "\n")
-
-        outfp.write("")
-        outfp.write(f"{INDENT}</channel>\n")
-        outfp.write("</rss>\n")
+        feed.extend(f"{item}\n" for item in items)
+        feed += [f"{INDENT}</channel>\n", "</rss>\n"]
 
-        if outfp != sys.stdout:
-            outfp.close()
+        # write UTF-8 bytes, as declared in the XML prolog, whatever the
+        # encoding of stdout is
+        feed = "".join(feed)
+        if opts.outfile is not None:
+            with open(opts.outfile, "wb") as outfp:
+                outfp.write(feed.encode("utf-8"))
+        elif hasattr(sys.stdout, "buffer"):
+            sys.stdout.flush()
+            sys.stdout.buffer.write(feed.encode("utf-8"))
+            sys.stdout.buffer.flush()
+        else:
+            sys.stdout.write(feed)
+
+        # the cache is optional, failing to save it must not cost the feed
+        if cache is not None:
+            try:
+                save_cache(opts.cache, cache)
+            except OSError as e:
+                sys.stderr.write(f"Warning: could not save cache: {e}\n")
 
     except Exception as e:
         sys.stderr.write(str(e) + "\n")
@@ -1,15 +1,39 @@
-import fnmatch
-import glob
+import concurrent.futures
+import functools
+import json
 import mimetypes
 import os
 import subprocess
-import urllib
+import time
+import urllib.parse
 from xml.sax import saxutils
 
-import eyed3
 import mutagen
+from mutagen import easyid3, id3
+from mutagen.mp3 import HeaderNotFoundError
 
 INDENT = "    "
+INDENT2 = INDENT * 2
+INDENT3 = INDENT * 3
+INDENT4 = INDENT * 4
+MEDIA_TYPES = {"audio", "video", "image"}
+# maximum time in seconds to wait for sox or ffprobe to probe a file
+COMMAND_TIMEOUT = 60
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = (
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+)
 
 
 def _run_command(args):
@@ -20,11 +44,17 @@ def _run_command(args):
             program's name.
 
     Returns:
-        output (str): Program output.
+        output (str): Program output or None if the program is not installed,
+        fails or doesn't return within COMMAND_TIMEOUT seconds.
     """
     try:
-        output = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except FileNotFoundError:
+        output = subprocess.run(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=COMMAND_TIMEOUT,
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
         return None
     if output.returncode != 0:
         return None
@@ -43,7 +73,7 @@ def get_duration_mutagen(filename):
     """
     try:
         file = mutagen.File(filename)
-    except mutagen.mp3.HeaderNotFoundError:
+    except HeaderNotFoundError:
         return None
     if file is not None:
         return round(file.info.length)
@@ -68,6 +98,40 @@ def get_duration_sox(filename):
             return None
 
 
+@functools.lru_cache(maxsize=None)
+def _import_av():
+    """Import PyAV on first use, it's optional. Return None if not installed."""
+    try:
+        import av
+    except ImportError:
+        return None
+    return av
+
+
+def get_duration_av(filename):
+    """Get file duration in seconds using PyAV, which calls FFmpeg's libraries
+    in-process. If PyAV is not installed or media file is not valid, return
+    None.
+
+    Args:
+        filename (str): Path to a file.
+
+    Returns:
+        duration (int): File duration in seconds or None if no duration could be
+            extracted.
+    """
+    av = _import_av()
+    if av is None:
+        return None
+    try:
+        with av.open(filename) as container:
+            duration = container.duration
+    except (av.error.FFmpegError, OSError):
+        return None
+    if duration is not None:
+        return round(duration / av.time_base)
+
+
 def get_duration_ffprobe(filename):
     """Get file duration in seconds using ffprobe. If ffprobe is not installed
     or media file is not valid, return None.
@@ -99,19 +163,154 @@ def get_duration_ffprobe(filename):
             return None
 
 
-def get_description(file_path):
+@functools.lru_cache(maxsize=None)
+def _quote_host(host):
+    """Percent-encode a host URL. The host is the same for all files of a feed
+    so it's only quoted once and the result is cached.
+    """
+    return urllib.parse.quote(host, ":/")
+
+
+@functools.lru_cache(maxsize=None)
+def get_mime_type(extension):
+    """Get the MIME type of files with a given extension and whether they are
+    media files (audio, video or image) that should be used as enclosures.
+    Results are cached so the mimetypes database is queried once per extension.
+
+    Args:
+        extension (str): Lowercase file extension, including the leading dot.
+
+    Returns:
+        mime_type (str): MIME type or None if it can't be guessed.
+
+        is_media (bool): Whether files with this extension are media files.
+    """
+    mime_type = mimetypes.guess_type(f"file{extension}")[0]
+    if mime_type is None:
+        return None, False
+    return mime_type, mime_type.split("/", 1)[0] in MEDIA_TYPES
+
+
+def get_description(file_path, txt_files=None):
     """
     Get description and summary from a .txt file with the same base name as the
     media file.
+
+    Args:
+        file_path (str): Path to the media file.
+
+        txt_files (set): Paths of the existing .txt files, as collected by
+            scan_files. If given, the file system is only accessed to read a
+            description that exists. Default: None (check if the file exists).
+
+    Returns:
+        description (str): Content of the .txt file or None.
     """
     txt_file = f"{os.path.splitext(file_path)[0]}.txt"
-    if os.path.exists(txt_file):
-        with open(txt_file, "r", encoding="utf-8") as fp:
-            return fp.read().strip()
-    return None
+    if txt_files is not None:
+        if txt_file not in txt_files:
+            return None
+    elif not os.path.exists(txt_file):
+        return None
+    with open(txt_file, "r", encoding="utf-8") as fp:
+        return fp.read().strip()
+
+
+def load_cache(filename):
+    """
+    Load a cache of media files' information, as written by save_cache.
+
+    Args:
+        filename (str): Path to the cache file.
+
+    Returns:
+        cache (dict): Cached information indexed by absolute file path. An empty
+        dict is returned if the cache file doesn't exist or can't be read.
+    """
+    try:
+        with open(filename, encoding="utf-8") as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_cache(filename, cache):
+    """
+    Save a cache of media files' information. The file is written atomically
+    so that an interrupted run doesn't leave a truncated cache behind.
+
+    Args:
+        filename (str): Path to the cache file.
+
+        cache (dict): Cache filled by file_to_item.
+
+    Raises:
+        OSError: If the cache file can't be written. No temporary file is
+            left behind in that case.
+    """
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "w", encoding="utf-8") as fp:
+            json.dump(cache, fp)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+def _is_valid_metadata(metadata):
+    """Check that cached metadata is a (title, duration) pair."""
+    return isinstance(metadata, (list, tuple)) and len(metadata) == 2
+
 
+def _get_cache_entry(cache, fname, st):
+    """
+    Get the cache entry of a file given its stat result. A new, empty entry
+    replaces the cached one if the file's modification time or size changed,
+    or if the cached entry is malformed.
+    """
+    key = os.path.abspath(fname)
+    entry = cache.get(key)
+    if (
+        not isinstance(entry, dict)
+        or entry.get("mtime") != st.st_mtime_ns
+        or entry.get("size") != st.st_size
+        or not _is_valid_metadata(entry.get("metadata", [None, None]))
+    ):
+        entry = {"mtime": st.st_mtime_ns, "size": st.st_size}
+        cache[key] = entry
+    return entry
 
-def file_to_item(host, fname, pub_date, use_metadata=False):
+
+def _get_cached_metadata(entry, fname):
+    """
+    Get the title and duration of a file from its cache entry, or with
+    get_metadata if they're not cached yet. Results without a duration are
+    not cached, so the file is probed again on the next run (e.g. once sox or
+    ffprobe is installed).
+    """
+    if entry is not None and "metadata" in entry:
+        title, duration = entry["metadata"]
+        return title, duration
+    title, duration = get_metadata(fname)
+    if entry is not None and duration is not None:
+        entry["metadata"] = [title, duration]
+    return title, duration
+
+
+def file_to_item(
+    host,
+    fname,
+    pub_date,
+    use_metadata=False,
+    stat=None,
+    cache=None,
+    txt_files=None,
+):
     """
     Inspect a file name to determine what kind of RSS item to build, and
     return the built item.
@@ -124,6 +323,22 @@ def file_to_item(host, fname, pub_date, use_metadata=False):
 
         pub_date (str): Publication date in RFC 822 format.
 
+        use_metadata (bool): Whether to use metadata to get the item title.
+            Default: False.
+
+        stat (os.stat_result): Result of stat on the file, as cached by
+            os.DirEntry.stat. Its size is used as the enclosure length and its
+            modification time to validate cache entries. If None, the file is
+            stat'ed when needed. Default: None.
+
+        cache (dict): If not None, a cache (as returned by load_cache) used to
+            get the duration and title (from tags) of files that didn't change
+            since the cache was filled. Missing information is added to it.
+            Default: None.
+
+        txt_files (set): Paths of the existing .txt files, passed to
+            get_description. Default: None.
+
     Returns:
         A string representing an RSS item, as with build_item.
 
@@ -138,28 +353,32 @@ def file_to_item(host, fname, pub_date, use_metadata=False):
                  <enclosure url="example.com/tests/media/1.mp3" type="audio/mpeg" length="0"/>
               </item>
     """
-    file_URL = urllib.parse.quote(host + fname.replace("\\", "/"), ":/")
-    file_mime_type = mimetypes.guess_type(fname)[0]
+    url_path = fname if os.sep == "/" else fname.replace(os.sep, "/")
+    file_URL = _quote_host(host) + urllib.parse.quote(url_path, ":/")
+    file_mime_type, is_media = get_mime_type(os.path.splitext(fname)[1].lower())
     tags = []
-
-    if file_mime_type is not None and (
-        "audio" in file_mime_type
-        or "video" in file_mime_type
-        or "image" in file_mime_type
-    ):
-        tagParams = 'url="{0}" type="{1}" length="{2}"'.format(
-            file_URL, file_mime_type, os.path.getsize(fname)
-        )
-        enclosure = {"name": "enclosure", "value": None, "params": tagParams}
-        tags.append(enclosure)
-
-    title = get_title(fname, use_metadata)
+    meta_title = duration = None
+
+    # only media files are worth probing, other files have no duration
+    if is_media:
+        if stat is None:
+            stat = os.stat(fname)
+        entry = None if cache is None else _get_cache_entry(cache, fname, stat)
+        tag_params = f'url="{file_URL}" type="{file_mime_type}" length="{stat.st_size}"'
+        tags.append({"name": "enclosure", "value": None, "params": tag_params})
+
+        # title from tags and duration are read from a single mutagen pass
+        meta_title, duration = _get_cached_metadata(entry, fname)
+
+    title = meta_title if use_metadata else None
+    if title is None:
+        # tags of files that aren't media files haven't been read yet
+        title = get_title(fname, use_metadata and not is_media)
     # Fetch description from a corresponding .txt file
-    description = get_description(fname)
+    description = get_description(fname, txt_files)
     if description is None:
         description = title
 
-    duration = get_duration(fname)
     if duration is not None:
         tags.append({"name": "itunes:duration", "value": str(duration)})
 
@@ -173,6 +392,79 @@ def file_to_item(host, fname, pub_date, use_metadata=False):
     )
 
 
+def files_to_items(
+    host, files, use_metadata=False, max_workers=None, cache=None, txt_files=None
+):
+    """
+    Build the RSS items of several files using a pool of threads. Building an
+    item is mostly spent reading media files or waiting for sox or ffprobe to
+    return, so items are built concurrently.
+
+    Args:
+        host (str): The hostname and directory to use for the links.
+
+        files (iterable): (fname, pub_date, stat) tuples, as expected by
+            file_to_item. stat can be None.
+
+        use_metadata (bool): Whether to use metadata to get item titles.
+            Default: False.
+
+        max_workers (int): Maximum number of threads. Default: None (use
+            ThreadPoolExecutor's default).
+
+        cache (dict): Cache passed to file_to_item. Default: None.
+
+        txt_files (set): Paths of the existing .txt files, passed to
+            file_to_item. Default: None.
+
+    Returns:
+        items (list): RSS items as strings, in the same order as files.
+    """
+
+    def _file_to_item(file):
+        fname, pub_date, stat = file
+        return file_to_item(host, fname, pub_date, use_metadata, stat, cache, txt_files)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(_file_to_item, files))
+
+
+def _get_title_from_tags(tags):
+    """Get the first title from mutagen tags, or None if there's none."""
+    if tags is None:
+        return None
+    try:
+        titles = tags["title"]
+    except KeyError:
+        return None
+    return titles[0] if titles else None
+
+
+def _load_media(filename):
+    """
+    Load a file with mutagen and get its title from tags. mutagen detects the
+    file type itself and, with easy=True, gives ID3 and MP4 tags the same
+    "title" key as other formats.
+
+    Returns:
+        media (mutagen.FileType): The loaded file or None if mutagen can't
+        read it.
+
+        title (str): Title read from the file's tags or None.
+    """
+    try:
+        media = mutagen.File(filename, easy=True)
+    except HeaderNotFoundError:
+        # MP3 file whose audio can't be read, its ID3 tags might still be
+        try:
+            return None, _get_title_from_tags(easyid3.EasyID3(filename))
+        except id3.ID3NoHeaderError:
+            return None, None
+    if media is None:
+        return None, None
+    return media, _get_title_from_tags(media.tags)
+
+
 def get_title(filename, use_metadata=False):
     """
     Get item title from file. If use_metadata is True, try reading title from
@@ -187,42 +479,9 @@ def get_title(filename, use_metadata=False):
         title (str): Item title.
     """
     if use_metadata:
-        try:
-            # file with ID3 tags
-            meta = eyed3.load(filename)
-            if meta and meta.tag is not None:
-                return meta.tag.title
-        except ImportError:
-            pass
-
-        try:
-            import mutagen
-            from mutagen import easyid3, easymp4, id3, mp4
-            from mutagen.mp3 import HeaderNotFoundError
-
-            try:
-                # file with ID3 tags
-                title = easyid3.EasyID3(filename)["title"]
-                if title:
-                    return title[0]
-            except (id3.ID3NoHeaderError, KeyError):
-                try:
-                    # file with MP4 tags
-                    title = easymp4.EasyMP4(filename)["title"]
-                    if title:
-                        return title[0]
-                except (mp4.MP4StreamInfoError, KeyError):
-                    try:
-                        # other media types
-                        meta = mutagen.File(filename)
-                        if meta is not None:
-                            title = meta["title"]
-                            if title:
-                                return title[0]
-                    except (KeyError, HeaderNotFoundError):
-                        pass
-        except ImportError:
-            pass
+        _, title = _load_media(filename)
+        if title is not None:
+            return title
 
     # fallback to filename as a title, remove extension though
     filename = os.path.basename(filename)
@@ -232,10 +491,11 @@ def get_title(filename, use_metadata=False):
 
 def get_duration(filename):
     """
-    Get item duration from media file using mutagen, sox or ffprobe in that
-    order. mutagen is tried first because it's a python package (so it doesn't
-    require running an external process), sox is tried before ffprobe because
-    it's faster, easier to install and return 0 for empty files.
+    Get item duration from media file using mutagen, PyAV (if installed), sox
+    or ffprobe in that order. mutagen and PyAV are tried first because they are
+    python packages (so they don't require running an external process), sox
+    is tried before ffprobe because it's faster, easier to install and return
+    0 for empty files.
 
 
     According to both Google and Apple, many formats are supported by the
@@ -252,6 +512,15 @@ def get_duration(filename):
         duration (int): The duration as the number of seconds or None.
     """
     duration = get_duration_mutagen(filename)
+    if duration is not None:
+        return duration
+    return _get_duration_fallback(filename)
+
+
+def _get_duration_fallback(filename):
+    """Get file duration with PyAV, sox or ffprobe, for files mutagen can't
+    read."""
+    duration = get_duration_av(filename)
     if duration is not None:
         return duration
 
@@ -262,6 +531,26 @@ def get_duration(filename):
     return get_duration_ffprobe(filename)
 
 
+def get_metadata(filename):
+    """
+    Get the title and the duration of a media file, reading the file with
+    mutagen only once for both. If mutagen can't read the file, the duration
+    is retrieved with PyAV, sox or ffprobe as in get_duration.
+
+    Args:
+        filename (str): Path to a file.
+
+    Returns:
+        title (str): Title read from the file's tags or None.
+
+        duration (int): The duration as the number of seconds or None.
+    """
+    media, title = _load_media(filename)
+    if media is None:
+        return title, _get_duration_fallback(filename)
+    return title, round(media.info.length)
+
+
 def make_description(description):
     """Make <description> and <itunes:summary> tags, handling multiline text."""
 
@@ -269,46 +558,62 @@ def make_description(description):
         description = ""
     lines = [line for line in description.split("\n") if line]
     if not lines:
-        description = f"{INDENT * 3}<description></description>"
-        itunes_summary = f"{INDENT * 3}<itunes:summary></itunes:summary>"
+        description = f"{INDENT3}<description></description>"
+        itunes_summary = f"{INDENT3}<itunes:summary></itunes:summary>"
 
     elif len(lines) == 1:
         desc_text = saxutils.escape(lines[0].strip())
-        description = f"{INDENT * 3}<description>{desc_text}</description>"
-        itunes_summary = f"{INDENT * 3}<itunes:summary>{desc_text}</itunes:summary>"
+        description = f"{INDENT3}<description>{desc_text}</description>"
+        itunes_summary = f"{INDENT3}<itunes:summary>{desc_text}</itunes:summary>"
     else:
         # multiline description
-        description = [f"{INDENT * 4}{line}" for line in lines]
+        description = [f"{INDENT4}{line}" for line in lines]
         description = "\n".join(description)
         desc_text = saxutils.escape(description)
 
-        description = (
-            f"{INDENT * 3}<description>\n{desc_text}\n{INDENT * 3}</description>"
-        )
+        description = f"{INDENT3}<description>\n{desc_text}\n{INDENT3}</description>"
         itunes_summary = (
-            f"{INDENT * 3}<itunes:summary>\n{desc_text}\n{INDENT * 3}</itunes:summary>"
+            f"{INDENT3}<itunes:summary>\n{desc_text}\n{INDENT3}</itunes:summary>"
         )
 
     return description, itunes_summary
 
 
+def format_rfc822_date(timestamp):
+    """
+    Format a timestamp as an RFC 822 date in UTC. The date is built directly
+    from the fields of time.gmtime instead of going through time.strftime, so
+    day and month names are always in English regardless of the locale.
+
+    Args:
+        timestamp (float): Number of seconds since the epoch.
+
+    Returns:
+        date (str): Date in RFC 822 format.
+
+    Example:
+        >>> format_rfc822_date(1419273000)
+        'Mon, 22 Dec 2014 18:30:00 +0000'
+    """
+    t = time.gmtime(timestamp)
+    return (
+        f"{WEEKDAYS[t.tm_wday]}, {t.tm_mday:02d} {MONTHS[t.tm_mon - 1]} "
+        f"{t.tm_year} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d} +0000"
+    )
+
+
 def build_extra_tag(tag):
     name = tag["name"]
-    value = tag.get("value", None)
-    params = tag.get("params", "")
-    if params is None:
-        params = ""
+    value = tag.get("value")
+    params = tag.get("params") or ""
     if isinstance(params, (list)):
         params = " ".join(params)
-    if len(params) > 0:
+    if params:
         params = " " + params
 
-    tag = f"{INDENT * 3}<{name}{params}"
     if value is None:
-        tag += "/>"
-    else:
-        tag += f">{value}</{name}>".format(value, name)
-    return tag
+        return f"{INDENT3}<{name}{params}/>"
+    return f"{INDENT3}<{name}{params}>{value}</{name}>"
 
 
 def build_item(
@@ -390,12 +695,12 @@ def build_item(
         # empty description, use title instead
         description, itunes_summary = make_description(title)
 
-    guid = f"{INDENT * 3}<guid>{guid}</guid>"
-    link = f"{INDENT * 3}<link>{link}</link>"
-    title = f"{INDENT * 3}<title>{saxutils.escape(title)}</title>"
+    guid = f"{INDENT3}<guid>{guid}</guid>"
+    link = f"{INDENT3}<link>{link}</link>"
+    title = f"{INDENT3}<title>{saxutils.escape(title)}</title>"
 
     tags = [
-        f"{INDENT * 2}<item>",
+        f"{INDENT2}<item>",
         guid,
         link,
         title,
@@ -404,18 +709,78 @@ def build_item(
     ]
 
     if pub_date is not None:
-        pub_date = f"{INDENT * 3}<pubDate>{pub_date}</pubDate>"
+        pub_date = f"{INDENT3}<pubDate>{pub_date}</pubDate>"
         tags.append(pub_date)
 
-    if extra_tags is None:
-        extra_tags = []
+    if extra_tags is not None:
+        tags.extend(build_extra_tag(tag) for tag in extra_tags)
+    tags.append(f"{INDENT2}</item>")
 
-    extra_tags = [build_extra_tag(tag) for tag in extra_tags]
+    return "\n".join(tags)
 
-    tags.extend(extra_tags)
-    tags.append(f"{INDENT * 2}</item>")
 
-    return "\n".join(tags)
+def _list_dir(dirname, recursive=False, followlinks=False):
+    """List the files and, if recursive, the subdirectories of a directory.
+
+    Entry types are read from the directory listing itself so no extra stat
+    call is needed per file. As with glob, hidden files are skipped in
+    non-recursive mode. A directory that can't be read is ignored, as os.walk
+    does.
+
+    Returns:
+        files (list): os.DirEntry objects of files.
+
+        subdirs (list): Paths of subdirectories to scan.
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(dirname) as it:
+            for entry in it:
+                if entry.is_file():
+                    if recursive or not entry.name.startswith("."):
+                        files.append(entry)
+                elif recursive and entry.is_dir(follow_symlinks=followlinks):
+                    subdirs.append(entry.path)
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def _scan_dir(dirname, recursive=False, followlinks=False, max_workers=None):
+    """Yield a DirEntry for each file in a directory using os.scandir.
+
+    In recursive mode, the subdirectories of a same level are listed
+    concurrently by a pool of threads, which mostly wait for the file system
+    (especially on network shares).
+
+    Args:
+        dirname (str): Path to a directory.
+
+        recursive (bool): If True, also scan subdirectories. Default: False.
+
+        followlinks (bool): If True, follow symbolic links to directories
+            during recursive scan. Default: False.
+
+        max_workers (int): Maximum number of threads used to list
+            subdirectories. Default: None (use ThreadPoolExecutor's default).
+
+    Yields:
+        entry (os.DirEntry): Entry of a file.
+    """
+    files, subdirs = _list_dir(dirname, recursive, followlinks)
+    yield from files
+    if not subdirs:
+        return
+
+    list_dir = functools.partial(_list_dir, recursive=True, followlinks=followlinks)
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        while subdirs:
+            next_subdirs = []
+            for files, dirs in executor.map(list_dir, subdirs):
+                yield from files
+                next_subdirs.extend(dirs)
+            subdirs = next_subdirs
 
 
 def get_files(dirname, extensions=None, recursive=False, followlinks=False):
@@ -452,29 +817,80 @@ def get_files(dirname, extensions=None, recursive=False, followlinks=False):
         True
     """
 
-    if dirname[-1] != os.sep:
-        dirname += os.sep
+    return [
+        entry.path for entry in scan_files(dirname, extensions, recursive, followlinks)
+    ]
 
-    selected_files = []
-    all_files = []
-    if recursive:
-        for root, _, filenames in os.walk(dirname, followlinks=followlinks):
-            for name in filenames:
-                all_files.append(os.path.join(root, name))
-    else:
-        all_files = [f for f in glob.glob(dirname + "*") if os.path.isfile(f)]
+
+def scan_files(
+    dirname,
+    extensions=None,
+    recursive=False,
+    followlinks=False,
+    max_workers=None,
+    txt_files=None,
+):
+    """
+    Same as get_files but return os.DirEntry objects instead of paths, sorted
+    by path. Entries cache the result of their stat() call, so callers that
+    need file sizes or modification times stat each file at most once.
+
+    Args:
+        dirname (str): path to a directory under the file system.
+
+        extensions (list of str): Extensions of the accepted files.
+            Default = None (i.e. return all files).
+
+        recursive (bool): If True, recursively look for files in subdirectories.
+            Default = False.
+
+        followlinks (bool): If True, follow symbolic links to directories during
+            recursive scan. Default = False.
+
+        max_workers (int): Maximum number of threads used to list
+            subdirectories. Default = None (use ThreadPoolExecutor's default).
+
+        txt_files (set): If not None, the paths of the .txt files found
+            during the scan are added to it, so that descriptions can be
+            looked up without accessing the file system. Default = None.
+
+    Returns:
+        selected_files (list): A list of os.DirEntry objects.
+    """
+    dirname = os.path.join(dirname, "")
 
     if extensions is not None:
-        for ext in {e.lower() for e in extensions}:
-            selected_files += [
-                f for f in all_files if fnmatch.fnmatch(f.lower(), f"*{ext}")
-            ]
-    else:
-        selected_files = all_files
+        extensions = {e.lower().lstrip(".") for e in extensions}
 
-    # remove files ending with .txt
-    selected_files = [
-        f for f in selected_files if not fnmatch.fnmatch(f.lower(), "*.txt")
-    ]
+    selected_files = []
+    for entry in _scan_dir(dirname, recursive, followlinks, max_workers):
+        ext = entry.name.rsplit(".", 1)[-1].lower()
+        # ignore files ending with .txt
+        if ext == "txt":
+            if txt_files is not None:
+                txt_files.add(entry.path)
+            continue
+        if extensions is None or ext in extensions:
+            selected_files.append(entry)
+
+    return sorted(selected_files, key=lambda entry: entry.path)
+
+
+def stat_files(entries, max_workers=None):
+    """
+    Call stat() on several os.DirEntry objects using a pool of threads. stat
+    calls are independent and mostly spent waiting for the file system, which
+    can be slow on network mounts. Entries cache their stat result, so later
+    calls to entry.stat() don't hit the file system again.
+
+    Args:
+        entries (list): os.DirEntry objects, as returned by scan_files.
 
-    return sorted(set(selected_files))
+        max_workers (int): Maximum number of threads. Default: None (use
+            ThreadPoolExecutor's default).
+
+    Returns:
+        stats (list): os.stat_result objects, in the same order as entries.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(os.DirEntry.stat, entries))
@@ -1,9 +1,26 @@
 import os
-import re
+import types
 
 import pytest
 
-from generss.util import build_item, file_to_item, get_duration, get_files, get_title
+from generss import util
+from generss.util import (
+    build_item,
+    file_to_item,
+    files_to_items,
+    format_rfc822_date,
+    get_description,
+    get_duration,
+    get_duration_av,
+    get_files,
+    get_metadata,
+    get_mime_type,
+    get_title,
+    load_cache,
+    save_cache,
+    scan_files,
+    stat_files,
+)
 
 
 @pytest.mark.parametrize(
@@ -54,6 +71,120 @@ def test_get_duration(filename, expected_duration):
     assert get_duration(filename) == expected_duration
 
 
+class FakeFFmpegError(Exception):
+    pass
+
+
+def _make_av_stub(duration=None, error=None):
+    """Build a stand-in for the PyAV module, which isn't a test dependency."""
+
+    class Container:
+        def __init__(self, filename):
+            if error is not None:
+                raise error(filename)
+            self.duration = duration
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+    return types.SimpleNamespace(
+        open=Container,
+        time_base=1000000,
+        error=types.SimpleNamespace(FFmpegError=FakeFFmpegError),
+    )
+
+
+@pytest.mark.parametrize(
+    "av_stub, expected_duration",
+    [
+        (_make_av_stub(duration=7140000), 7),
+        (_make_av_stub(duration=None), None),
+        (_make_av_stub(error=FakeFFmpegError), None),
+        (_make_av_stub(error=FileNotFoundError), None),
+        (None, None),
+    ],
+    ids=[
+        "duration_7.14_seconds",
+        "no_duration",
+        "ffmpeg_error",
+        "os_error",
+        "av_not_installed",
+    ],
+)
+def test_get_duration_av(monkeypatch, av_stub, expected_duration):
+    monkeypatch.setattr(util, "_import_av", lambda: av_stub)
+    assert get_duration_av("file.ogg") == expected_duration
+
+
+def test_get_duration_fallback_without_av(monkeypatch):
+    def ffprobe(filename):
+        raise AssertionError("ffprobe shouldn't run if sox succeeds")
+
+    monkeypatch.setattr(util, "_import_av", lambda: None)
+    monkeypatch.setattr(util, "get_duration_sox", lambda filename: 5)
+    monkeypatch.setattr(util, "get_duration_ffprobe", ffprobe)
+    assert util._get_duration_fallback("file.ogg") == 5
+
+
+@pytest.mark.parametrize(
+    "filename, expected_title, expected_duration",
+    [
+        (os.path.join("tests", "silence", "silence_7.14_seconds.ogg"), None, 7),
+        (
+            os.path.join("tests", "media", "flac_with_tags.flac"),
+            "Test FLAC file with tags",
+            0,
+        ),
+        (
+            os.path.join("tests", "media", "mp3_with_tags.mp3"),
+            "Test media file with ID3 tags",
+            0,
+        ),
+        (os.path.join("tests", "media", "1.mp3"), None, None),
+    ],
+    ids=[
+        "ogg_without_tags",
+        "flac_with_tags",
+        "mp3_with_tags",
+        "invalid_mp3",
+    ],
+)
+def test_get_metadata(filename, expected_title, expected_duration):
+    assert get_metadata(filename) == (expected_title, expected_duration)
+
+
+@pytest.mark.parametrize(
+    "extension, expected_mime_type, expected_is_media",
+    [
+        (".mp3", "audio/mpeg", True),
+        (".mp4", "video/mp4", True),
+        (".png", "image/png", True),
+        (".txt", "text/plain", False),
+        (".md5", None, False),
+        ("", None, False),
+    ],
+    ids=["mp3", "mp4", "png", "txt", "unknown", "no_extension"],
+)
+def test_get_mime_type(extension, expected_mime_type, expected_is_media):
+    assert get_mime_type(extension) == (expected_mime_type, expected_is_media)
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected_date",
+    [
+        (0, "Thu, 01 Jan 1970 00:00:00 +0000"),
+        (1419273000, "Mon, 22 Dec 2014 18:30:00 +0000"),
+        (1484610907.9, "Mon, 16 Jan 2017 23:55:07 +0000"),
+    ],
+    ids=["epoch", "simple", "fractional_seconds"],
+)
+def test_format_rfc822_date(timestamp, expected_date):
+    assert format_rfc822_date(timestamp) == expected_date
+
+
 @pytest.mark.parametrize(
     "link, title, guid, description, pub_date, extra_tags, expected_item",
     [
@@ -240,6 +371,22 @@ def test_get_duration(filename, expected_duration):
                     <tag2>Value2</tag2>
                 </item>""",
         ),
+        (
+            "link/to/website/media/item1",
+            "Title 1",
+            "item1",
+            "Description of item 1",
+            None,
+            [{"name": "tag", "value": "{value}"}],
+            """<item>
+                    <guid>item1</guid>
+                    <link>link/to/website/media/item1</link>
+                    <title>Title 1</title>
+                    <description>Description of item 1</description>
+                    <itunes:summary>Description of item 1</itunes:summary>
+                    <tag>{value}</tag>
+                </item>""",
+        ),
     ],
     ids=[
         "simple",
@@ -251,6 +398,7 @@ def test_get_duration(filename, expected_duration):
         "extra_tags_no_value_params_string",
         "extra_tags_multiple_no_value",
         "extra_tags_multiple_with_value",
+        "extra_tags_value_with_braces",
     ],
 )
 def test_build_item(
@@ -272,8 +420,8 @@ def test_build_item(
         extra_tags,
     )
 
-    item = re.sub(r"\s+", " ", item.strip())
-    expected_item = re.sub(r"\s+", " ", expected_item.strip())
+    item = " ".join(item.split())
+    expected_item = " ".join(expected_item.split())
     assert item == expected_item
 
 
@@ -383,11 +531,83 @@ def test_build_item(
 )
 def test_file_to_item(host, fname, pub_date, use_metadata, expected_item):
     item = file_to_item(host, fname, pub_date, use_metadata)
-    item = re.sub(r"\s+", " ", item.strip())
-    expected_item = re.sub(r"\s+", " ", expected_item.strip())
+    item = " ".join(item.split())
+    expected_item = " ".join(expected_item.split())
     assert item == expected_item
 
 
+def test_files_to_items():
+    host = "example.com/"
+    pub_date = "Mon, 16 Jan 2017 23:55:07 +0000"
+    fnames = get_files(os.path.join("tests", "silence")) + get_files(
+        os.path.join("tests", "media")
+    )
+    expected_items = [file_to_item(host, f, pub_date, True) for f in fnames]
+    files = [(f, pub_date, None) for f in fnames]
+    assert files_to_items(host, files, True, max_workers=4) == expected_items
+
+
+def test_file_to_item_cache(tmp_path):
+    host = "example.com/"
+    pub_date = "Mon, 16 Jan 2017 23:55:07 +0000"
+    fname = os.path.join("tests", "silence", "silence_2.5_seconds.wav")
+    cache = {}
+    expected_item = file_to_item(host, fname, pub_date, True)
+    assert file_to_item(host, fname, pub_date, True, cache=cache) == expected_item
+
+    cache_file = str(tmp_path / "cache.json")
+    save_cache(cache_file, cache)
+    cache = load_cache(cache_file)
+    entry = cache[os.path.abspath(fname)]
+    assert entry["metadata"] == [None, 2]
+
+    # cached information is used as long as the file doesn't change
+    entry["metadata"] = ["Cached title", 42]
+    item = file_to_item(host, fname, pub_date, True, cache=cache)
+    assert "<title>Cached title</title>" in item
+    assert "<itunes:duration>42</itunes:duration>" in item
+    entry["mtime"] -= 1
+    assert file_to_item(host, fname, pub_date, True, cache=cache) == expected_item
+
+
+@pytest.mark.parametrize(
+    "metadata",
+    ["oops", ["Title"], ["Title", 1, 2], None],
+    ids=["string", "too_short", "too_long", "null"],
+)
+def test_file_to_item_malformed_cache(metadata):
+    host = "example.com/"
+    pub_date = "Mon, 16 Jan 2017 23:55:07 +0000"
+    fname = os.path.join("tests", "silence", "silence_2.5_seconds.wav")
+    st = os.stat(fname)
+    key = os.path.abspath(fname)
+    cache = {key: {"mtime": st.st_mtime_ns, "size": st.st_size, "metadata": metadata}}
+    expected_item = file_to_item(host, fname, pub_date, True)
+    assert file_to_item(host, fname, pub_date, True, cache=cache) == expected_item
+    assert cache[key]["metadata"] == [None, 2]
+
+
+def test_file_to_item_cache_failed_probe():
+    # files without a known duration are probed again on the next run
+    cache = {}
+    fname = os.path.join("tests", "media", "1.mp3")
+    file_to_item("example.com/", fname, "Mon, 16 Jan 2017 23:55:07 +0000", cache=cache)
+    assert "metadata" not in cache[os.path.abspath(fname)]
+
+
+def test_load_cache_missing_file(tmp_path):
+    assert load_cache(str(tmp_path / "missing.json")) == {}
+
+
+def test_save_cache_error(tmp_path):
+    # the cache path is a directory, so the temporary file can't replace it
+    cache_file = tmp_path / "cache.json"
+    cache_file.mkdir()
+    with pytest.raises(OSError):
+        save_cache(str(cache_file), {})
+    assert os.listdir(str(tmp_path)) == ["cache.json"]
+
+
 @pytest.mark.parametrize(
     "dirname, extensions, recursive, followlinks, expected_files",
     [
@@ -429,12 +649,40 @@ def test_file_to_item(host, fname, pub_date, use_metadata, expected_item):
                 os.path.join("tests", "media", "subdir_2", "4.mp4"),
             ],
         ),
+        (
+            os.path.join("tests", "media"),
+            ["wav", "ogg"],
+            True,
+            True,
+            [os.path.join("tests", "media", "1.ogg")]
+            + [
+                os.path.join("tests", "media", "subdir_link", f)
+                for f in ["silence_2.5_seconds.wav", "silence_7.14_seconds.ogg"]
+            ],
+        ),
     ],
     ids=[
         "all_files_in_media",
         "only_mp3_files_in_media",
         "recursive_mp4_files_in_media",
+        "recursive_follow_symlinks",
     ],
 )
 def test_get_files(dirname, extensions, recursive, followlinks, expected_files):
     assert get_files(dirname, extensions, recursive, followlinks) == expected_files
+
+
+def test_stat_files():
+    entries = scan_files(os.path.join("tests", "media"), recursive=True)
+    stats = stat_files(entries, max_workers=4)
+    assert [st.st_size for st in stats] == [
+        os.path.getsize(entry.path) for entry in entries
+    ]
+
+
+def test_get_description_txt_files():
+    txt_files = set()
+    entries = scan_files(os.path.join("tests", "media"), txt_files=txt_files)
+    assert txt_files == {os.path.join("tests", "media", "1.txt")}
+    for entry in entries:
+        assert get_description(entry.path, txt_files) == get_description(entry.path)